@@ -97,6 +97,61 @@ REAL_NOAA_TILES = [
     }
 ]
 
+"""
+FILTERING MANY TILES BY BOUNDING BOX
+------------------------------------
+
+For large tile catalogs, keep one column per field (a NumPy structured array)
+instead of a list of nested dicts. Bounding-box and time filters then become
+a single vectorized mask rather than a Python loop.
+"""
+
+import numpy as np
+
+TILE_DTYPE = np.dtype([
+    ("west", "f4"),
+    ("south", "f4"),
+    ("east", "f4"),
+    ("north", "f4"),
+    ("ts", "datetime64[s]"),
+    ("image_id", "U32"),
+    ("tile_url", "U128"),
+    ("mission", "U16"),
+])
+
+
+def tiles_to_array(tiles):
+    """Convert a list of tile dicts (like REAL_NOAA_TILES) to a structured array."""
+    return np.array([
+        (
+            t["bounds"]["west"],
+            t["bounds"]["south"],
+            t["bounds"]["east"],
+            t["bounds"]["north"],
+            np.datetime64(t["timestamp"].rstrip("Z"), "s"),
+            t["image_id"],
+            t["tile_url"],
+            t["metadata"]["mission"],
+        )
+        for t in tiles
+    ], dtype=TILE_DTYPE)
+
+
+def filter_bbox(arr, west, south, east, north):
+    """Return the tiles that intersect the given bounding box."""
+    mask = (
+        (arr["west"] < east) & (arr["east"] > west) &
+        (arr["south"] < north) & (arr["north"] > south)
+    )
+    return arr[mask]
+
+
+REAL_NOAA_TILES_ARRAY = tiles_to_array(REAL_NOAA_TILES)
+
+# Example usage:
+# hits = filter_bbox(REAL_NOAA_TILES_ARRAY, west=-82.45, south=26.55, east=-82.35, north=26.65)
+# print(hits["image_id"])
+
 """
 CALCULATING BOUNDS FROM TILE COORDINATES
 -----------------------------------------
@@ -108,17 +163,14 @@ import math
 
 def tile_to_bounds(z, x, y):
     """Convert tile coordinates to lat/lon bounds."""
-    def tile_to_lon(x, z):
-        return x / (2 ** z) * 360 - 180
-    
-    def tile_to_lat(y, z):
-        n = math.pi - 2 * math.pi * y / (2 ** z)
-        return math.degrees(math.atan(math.sinh(n)))
+    n = 1 << z
+    inv_n = 1.0 / n
+    lat_scale = 2 * math.pi * inv_n
     
-    west = tile_to_lon(x, z)
-    east = tile_to_lon(x + 1, z)
-    north = tile_to_lat(y, z)
-    south = tile_to_lat(y + 1, z)
+    west = x * inv_n * 360 - 180
+    east = (x + 1) * inv_n * 360 - 180
+    north = math.degrees(math.atan(math.sinh(math.pi - y * lat_scale)))
+    south = math.degrees(math.atan(math.sinh(math.pi - (y + 1) * lat_scale)))
     
     return {
         "west": west,
@@ -130,6 +182,9 @@ def tile_to_bounds(z, x, y):
 # Example usage:
 # bounds = tile_to_bounds(z=19, x=165234, y=234567)
 # print(bounds)
+#
+# For many tiles at once, tile_math.tiles_to_bounds(xs, ys, z) runs the same
+# math over NumPy arrays and returns a west/south/east/north structured array.
 
 
 """
@@ -1,32 +1,239 @@
 """
 Test script to find working NOAA tile URLs
+
+Usage:
+    python find_noaa_urls.py [--force]
+
+Probe results are cached in .noaa_probe_cache for the server's
+Cache-Control max-age (or a day if none is sent). Stale entries are
+revalidated with If-None-Match, so unchanged tiles cost a bodiless 304.
+Only definitive answers (found, 404, 410) are cached; server errors are
+probed again on the next run.
+Pass --force to ignore the cache and hit the network for every URL.
+
+NOAA serves plain z/x/y tiles with no bundle or multi-tile endpoint, so each
+tile is probed on its own; the shared keep-alive session and ProbeQueue keep
+that cheap.
 """
+import argparse
+import re
+import itertools
+import shelve
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urlunsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Common NOAA storm names and dates
 test_urls = [
     # Hurricane Ian 2022 - Florida
     "https://storms.ngs.noaa.gov/storms/ian/20220929_oblique/tiles/19/165234/234567.png",
     "https://storms.ngs.noaa.gov/storms/ian/20221001_oblique/tiles/19/165234/234567.png",
-    
+
     # Hurricane Fiona 2022 - Puerto Rico
     "https://storms.ngs.noaa.gov/storms/fiona/20220920_oblique/tiles/19/153234/123456.png",
-    
+
     # Hurricane Idalia 2023 - Florida
     "https://storms.ngs.noaa.gov/storms/idalia/20230831_oblique/tiles/19/165234/234567.png",
 ]
 
+# Equivalent tile hosts; probes are spread across them round-robin to avoid
+# per-host connection limits. Extend if NOAA mirrors are discovered.
+HOSTS = ("storms.ngs.noaa.gov",)
+
+# Matches the per-origin connection cap browsers use
+MAX_INFLIGHT_PER_HOST = 6
+MAX_INFLIGHT = MAX_INFLIGHT_PER_HOST * len(HOSTS)
+
+# On-disk probe cache: url -> {"status", "etag", "ts", "ttl"}
+CACHE_PATH = ".noaa_probe_cache"
+CACHE_TTL = 24 * 60 * 60
+# Only definitive answers are cached; server errors are probed again next run
+CACHEABLE_STATUSES = (200, 206, 304, 404, 410)
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# Shared session so every probe reuses the same keep-alive connections.
+# requests speaks HTTP/1.1 only, so concurrency comes from a pool of
+# MAX_INFLIGHT_PER_HOST connections per host rather than HTTP/2 streams.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=len(HOSTS),
+    pool_maxsize=MAX_INFLIGHT_PER_HOST,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 503])
+))
+
+print_lock = threading.Lock()
+
+
+def report_status(url, status, cached=False):
+    """Print the outcome of a probe."""
+    suffix = " (cached)" if cached else ""
+    if status in (200, 206):
+        report(f"✓ FOUND: {url}{suffix}")
+    else:
+        report(f"✗ {status}: {url}{suffix}")
+
+
+def canonical_url(url):
+    """Normalize scheme/host case and trailing slashes so URL variants dedupe."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def with_host(url, host):
+    """
+    Return url with its host swapped for one of the equivalent HOSTS. URLs on
+    any other host (e.g. stormscdn.ngs.noaa.gov) are returned unchanged.
+    """
+    parts = urlsplit(url)
+    if parts.hostname not in HOSTS:
+        return url
+    return parts._replace(netloc=host).geturl()
+
+
+def probe(url, etag=None):
+    """
+    Check that a tile exists by fetching its first byte. NOAA's CDN handles
+    Range GETs more reliably than HEAD; both 200 and 206 mean found. With an
+    etag from a previous probe, a 304 means the tile is unchanged.
+    """
+    headers = {"Range": "bytes=0-0"}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = session.get(
+        url,
+        headers=headers,
+        timeout=10,
+        stream=True,
+        allow_redirects=False
+    )
+    response.close()
+    return response
+
+
+def cache_entry(response, previous=None):
+    """Build the cache entry for a probe response, honoring Cache-Control max-age."""
+    match = MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    ttl = int(match.group(1)) if match else CACHE_TTL
+    if response.status_code == 304 and previous is not None:
+        return {**previous, "ts": time.time(), "ttl": ttl}
+    return {
+        "status": response.status_code,
+        "etag": response.headers.get("ETag"),
+        "ts": time.time(),
+        "ttl": ttl,
+    }
+
+
+def report(line):
+    """Print a result line without interleaving output from other threads."""
+    with print_lock:
+        print(line)
+
+
+
+class ProbeQueue:
+    """
+    Caps the number of in-flight probes against NOAA, modelled on the
+    Leaflet.utfgrid request queue. Jobs wait in a pending deque until a slot
+    frees up, and can be cancelled by key while they are still waiting.
+    """
+
+    def __init__(self, executor, max_inflight=4):
+        self._executor = executor
+        self._slots = threading.Semaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._inflight = {}
+
+    def queue_request(self, key, url, etag=None):
+        """Schedule a probe for url under key (e.g. a (z, x, y) tuple)."""
+        with self._lock:
+            self._pending.append(key)
+            future = self._executor.submit(self._run, key, url, etag)
+            self._inflight[key] = future
+        return future
+
+    def cancel(self, key):
+        """Drop a probe that has not started yet. Returns True if it was dropped."""
+        with self._lock:
+            if key not in self._pending:
+                return False
+            self._pending.remove(key)
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.cancel()
+        return True
+
+    def _run(self, key, url, etag):
+        with self._slots:
+            with self._lock:
+                if key not in self._pending:
+                    return None  # Cancelled while waiting for a slot
+                self._pending.remove(key)
+            try:
+                return probe(url, etag)
+            finally:
+                self._finish_request(key)
+
+    def _finish_request(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+
+parser = argparse.ArgumentParser(description="Probe NOAA tile URLs")
+parser.add_argument("--force", action="store_true", help="ignore cached probe results")
+args = parser.parse_args()
+
 print("Testing NOAA tile URLs...\n")
 
-for url in test_urls:
-    try:
-        response = requests.head(url, timeout=10)
-        if response.status_code == 200:
-            print(f"✓ FOUND: {url}")
+with shelve.open(CACHE_PATH) as cache, session, ThreadPoolExecutor(max_workers=MAX_INFLIGHT) as executor:
+    # Probe each distinct URL once, but report under every spelling given
+    variants = {}
+    for url in test_urls:
+        variants.setdefault(canonical_url(url), []).append(url)
+
+    to_probe = []
+    for url in variants:
+        entry = None if args.force else cache.get(url)
+        if not isinstance(entry, dict):
+            entry = None  # Missing, or written by an older version of this script
+        if entry is not None and time.time() - entry["ts"] < entry["ttl"]:
+            for variant in variants[url]:
+                report_status(variant, entry["status"], cached=True)
         else:
-            print(f"✗ {response.status_code}: {url}")
-    except Exception as e:
-        print(f"✗ ERROR: {url} - {str(e)}")
+            to_probe.append((url, entry))
+
+    queue = ProbeQueue(executor, max_inflight=MAX_INFLIGHT)
+    hosts = itertools.cycle(HOSTS)
+    futures = {
+        queue.queue_request(url, with_host(url, next(hosts)), entry and entry["etag"]): (url, entry)
+        for url, entry in to_probe
+    }
+    for future in as_completed(futures):
+        url, entry = futures[future]
+        if future.cancelled():
+            continue
+        try:
+            response = future.result()
+            if response is None:
+                continue
+            if response.status_code in CACHEABLE_STATUSES:
+                entry = cache_entry(response, entry)
+                cache[url] = entry
+            else:
+                entry = {"status": response.status_code}
+            for variant in variants[url]:
+                report_status(variant, entry["status"])
+        except Exception as e:
+            for variant in variants[url]:
+                report(f"✗ ERROR: {variant} - {str(e)}")
 
 print("\n" + "="*60)
 print("If you found working URLs above, use them in test_index.py")
@@ -29,66 +29,120 @@ COMMON MELISSA TILE URL PATTERNS:
 ==================================
 """
 
-import math
+import argparse
+import functools
+import json
+import sys
 
-def get_tile_coords_for_jamaica():
+from tile_math import (
+    child_tiles_in_bbox, latlon_to_tile, tile_neighborhood, tile_to_bounds,
+    tiles_in_bbox, tiles_to_bounds,
+)
+
+TILE_URL_TEMPLATE = "https://storms.ngs.noaa.gov/storms/melissa/{date}_oblique/tiles/{zoom}/{x}/{y}.png"
+
+def write_tiles_jsonl(records, out):
+    """Write tile records as JSON Lines to a path, or to stdout if out is "-"."""
+    text = "".join(json.dumps(r) + "\n" for r in records)
+    if out == "-":
+        sys.stdout.write(text)
+    else:
+        with open(out, "w") as f:
+            f.write(text)
+
+
+def get_tile_coords_for_jamaica(radius=1, out=None, bbox=None):
     """
     Generate tile coordinates for Jamaica area.
     Jamaica center: approximately 18.18° N, -77.39° W
+
+    radius controls how many rings of surrounding tiles are listed around
+    the center tile (1 gives the 3x3 neighborhood). If bbox is given as
+    (west, south, east, north), every tile covering it is listed instead.
+    If out is given, the tiles are written there as JSON Lines instead of
+    printed as a report.
     """
     
-    def latlon_to_tile(lat, lon, zoom):
-        """Convert lat/lon to tile coordinates."""
-        lat_rad = math.radians(lat)
-        n = 2.0 ** zoom
-        x = int((lon + 180.0) / 360.0 * n)
-        y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-        return x, y
-    
-    def tile_to_bounds(x, y, zoom):
-        """Convert tile coordinates back to lat/lon bounds."""
-        n = 2.0 ** zoom
-        west = x / n * 360.0 - 180.0
-        east = (x + 1) / n * 360.0 - 180.0
-        
-        lat_rad_north = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
-        north = math.degrees(lat_rad_north)
-        
-        lat_rad_south = math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n)))
-        south = math.degrees(lat_rad_south)
-        
-        return {"west": west, "south": south, "east": east, "north": north}
-    
     # Jamaica coordinates
     jamaica_center = (18.18, -77.39)
     
     # Typical zoom levels for NOAA imagery
     zoom_levels = [18, 19, 20]
     
-    print("Potential tile coordinates for Jamaica:")
-    print("="*60)
+    lines = [
+        "Potential tile coordinates for Jamaica:",
+        "="*60,
+    ]
+    records = []
+    # Covering tiles at the previous zoom, refined into the next one
+    prev = None
     
     for zoom in zoom_levels:
+        # Bind the per-zoom fields once; only x/y vary per tile
+        tile_url = functools.partial(TILE_URL_TEMPLATE.format, date="YYYYMMDD", zoom=zoom)
         x, y = latlon_to_tile(jamaica_center[0], jamaica_center[1], zoom)
         bounds = tile_to_bounds(x, y, zoom)
         
-        print(f"\nZoom {zoom}:")
-        print(f"  Center tile: {x}/{y}")
-        print(f"  Bounds: {bounds}")
-        print(f"  URL pattern: https://storms.ngs.noaa.gov/storms/melissa/YYYYMMDD_oblique/tiles/{zoom}/{x}/{y}.png")
+        lines.append(f"\nZoom {zoom}:")
+        lines.append(f"  Center tile: {x}/{y}")
+        lines.append(f"  Bounds: {bounds}")
+        lines.append(f"  URL pattern: {tile_url(x=x, y=y)}")
         
-        # Generate URLs for surrounding tiles
-        print(f"\n  Surrounding tiles:")
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                tile_x = x + dx
-                tile_y = y + dy
-                b = tile_to_bounds(tile_x, tile_y, zoom)
-                print(f"    tiles/{zoom}/{tile_x}/{tile_y}.png")
-                print(f"      Bounds: W:{b['west']:.4f}, S:{b['south']:.4f}, E:{b['east']:.4f}, N:{b['north']:.4f}")
+        if bbox is None:
+            # Generate URLs for surrounding tiles
+            lines.append(f"\n  Surrounding tiles:")
+            xs, ys = tile_neighborhood(x, y, radius)
+            b = tiles_to_bounds(xs, ys, zoom)
+        else:
+            lines.append(f"\n  Tiles covering {bbox}:")
+            if prev is not None and prev[3] == zoom - 1:
+                # Tiles nest across zooms, so split the previous zoom's
+                # tiles instead of recomputing every bound
+                xs, ys, b = child_tiles_in_bbox(*prev, *bbox)
+            else:
+                xs, ys = tiles_in_bbox(*bbox, zoom)
+                b = tiles_to_bounds(xs, ys, zoom)
+            prev = (xs, ys, b, zoom)
+        if out is not None:
+            records.extend(
+                {
+                    "zoom": zoom, "x": tx, "y": ty,
+                    "west": w, "south": s, "east": e, "north": n,
+                    "tile_url": tile_url(x=tx, y=ty),
+                }
+                for tx, ty, w, s, e, n in zip(
+                    xs.tolist(), ys.tolist(),
+                    b["west"].tolist(), b["south"].tolist(), b["east"].tolist(), b["north"].tolist()
+                )
+            )
+            continue
+        lines.extend(
+            f"    tiles/{zoom}/{tx}/{ty}.png\n"
+            f"      Bounds: W:{w:.4f}, S:{s:.4f}, E:{e:.4f}, N:{n:.4f}"
+            for tx, ty, w, s, e, n in zip(
+                xs.tolist(), ys.tolist(),
+                b["west"].tolist(), b["south"].tolist(), b["east"].tolist(), b["north"].tolist()
+            )
+        )
+    
+    if out is not None:
+        write_tiles_jsonl(records, out)
+        return
+    
+    # One write for the whole report instead of a print() per line
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
-    get_tile_coords_for_jamaica()
+    parser = argparse.ArgumentParser(description="List NOAA tile coordinates around Jamaica")
+    parser.add_argument("--radius", type=int, default=1, help="rings of surrounding tiles")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+                        help="list every tile covering this box instead of the neighborhood")
+    parser.add_argument("--out", help="write tiles as JSON Lines to this path ('-' for stdout)")
+    args = parser.parse_args()
+    
+    get_tile_coords_for_jamaica(radius=args.radius, out=args.out, bbox=args.bbox)
+    if args.out is not None:
+        sys.exit(0)
     
     print("\n" + "="*60)
     print("NEXT STEPS:")
@@ -2,17 +2,27 @@ import os
 import io
 import json
 import logging
+import queue
 import hashlib
-from typing import Optional, Dict, Any, List, Tuple
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta
-from functools import wraps
+from functools import wraps, lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
 
+import numpy as np
+import orjson
 import requests
+import torch
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from PIL import Image
 
 from flask import Flask, request, jsonify, Request, g
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -39,8 +49,22 @@ class Config:
     # Chroma storage
     CHROMA_DIR = os.environ.get("CHROMA_DIR", "/app/chroma_db")
     
+    # HNSW index parameters, applied when the collection is first created.
+    # Higher M / construction_ef give a better graph at the cost of memory and
+    # indexing time; higher search_ef raises recall at the cost of query latency.
+    # Chroma's HNSW index stores full float32 vectors (2 KB per CLIP embedding)
+    # and has no int8/binary quantization option.
+    HNSW_SPACE = "cosine"  # CLIP embeddings are compared by cosine similarity
+    HNSW_M = int(os.environ.get("HNSW_M", 32))
+    HNSW_CONSTRUCTION_EF = int(os.environ.get("HNSW_CONSTRUCTION_EF", 200))
+    HNSW_SEARCH_EF = int(os.environ.get("HNSW_SEARCH_EF", 100))
+    HNSW_NUM_THREADS = os.cpu_count() or 1
+    
     # CLIP model
     CLIP_MODEL_NAME = "sentence-transformers/clip-ViT-B-32"
+    CLIP_INPUT_SIZE = 224  # ViT-B/32 resizes images to 224px before encoding
+    CLIP_DEVICE = os.environ.get("CLIP_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+    CLIP_BATCH_SIZE = int(os.environ.get("CLIP_BATCH_SIZE", 32))
     HF_HOME = os.environ.get("HF_HOME", "/app/hf_cache")
     
     # Authentication
@@ -48,6 +72,7 @@ class Config:
     
     # Firestore
     COLLECTION_NAME = "satellite_images"
+    URL_INDEX_COLLECTION = "satellite_images_by_url"  # Doc ID = url_hash
     
     # Security
     ALLOWED_DOMAINS = [
@@ -61,11 +86,20 @@ class Config:
     
     # Search limits
     MAX_RESULTS = 100
+    TEXT_CACHE_SIZE = 4096  # Cached query embeddings
+    TEXT_BATCH_SIZE = 32  # Concurrent query encodes coalesced per forward pass
+    TEXT_BATCH_WAIT = 0.01  # Seconds to wait for more queries to join a batch
     DEFAULT_K = 10
     ROI_MULTIPLIER = 3
     
+    # Batch indexing
+    MAX_BATCH_TILES = 100
+    FIRESTORE_BATCH_LIMIT = 500  # Firestore's max writes per batch
+    
     # Request timeouts
     DOWNLOAD_TIMEOUT = 20
+    DOWNLOAD_WORKERS = 16
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
     MAX_RETRIES = 3
     
     # Rate limiting
@@ -109,38 +143,122 @@ os.makedirs(Config.CHROMA_DIR, exist_ok=True)
 
 logger.info("Initializing ChromaDB...")
 chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DIR)
-chroma_collection = chroma_client.get_or_create_collection(Config.COLLECTION_NAME)
+try:
+    chroma_collection = chroma_client.get_or_create_collection(
+        Config.COLLECTION_NAME,
+        metadata={
+            "hnsw:space": Config.HNSW_SPACE,
+            "hnsw:M": Config.HNSW_M,
+            "hnsw:construction_ef": Config.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": Config.HNSW_SEARCH_EF,
+            "hnsw:num_threads": Config.HNSW_NUM_THREADS,
+        }
+    )
+except Exception as e:
+    # Existing collections keep the index settings they were created with
+    logger.warning(f"Could not apply HNSW settings, opening collection as-is: {e}")
+    chroma_collection = chroma_client.get_or_create_collection(Config.COLLECTION_NAME)
 logger.info(f"ChromaDB initialized with {chroma_collection.count()} records")
 
 logger.info("Loading CLIP model...")
 clip_model = SentenceTransformer(
     Config.CLIP_MODEL_NAME,
-    cache_folder=Config.HF_HOME
+    cache_folder=Config.HF_HOME,
+    device=Config.CLIP_DEVICE
 )
-logger.info("CLIP model loaded successfully")
+clip_model.eval()
+if clip_model.device.type == "cuda":
+    # FP16 halves memory traffic per forward pass; CPU kernels stay FP32.
+    # encode_* cast the output back to float32 before it reaches Chroma.
+    clip_model.half()
+logger.info(f"CLIP model loaded successfully on {clip_model.device}")
+
+
+def warm_up() -> None:
+    """
+    Run one text and one image encode and one Chroma query so kernel
+    selection, CUDA context setup and loading the HNSW graph from disk
+    happen at startup instead of on the first request.
+    """
+    start_ns = time.perf_counter_ns()
+    try:
+        with torch.inference_mode():
+            q_emb = clip_model.encode("warmup", normalize_embeddings=True, convert_to_numpy=True)
+            blank = Image.new("RGB", (Config.CLIP_INPUT_SIZE, Config.CLIP_INPUT_SIZE))
+            clip_model.encode([blank], normalize_embeddings=True, convert_to_numpy=True)
+        if chroma_collection.count() > 0:
+            chroma_collection.query(
+                query_embeddings=[q_emb.astype(np.float32, copy=False)],
+                n_results=1,
+                include=[],
+            )
+        elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+        logger.info(f"Warm-up completed in {elapsed:.2f}s")
+    except Exception as e:
+        logger.warning(f"Warm-up failed, first requests may be slow: {e}")
+
+warm_up()
 
 
 # -------------------- HTTP SESSION WITH RETRY --------------------
 
 def create_session() -> requests.Session:
-    """Create a requests session with retry logic."""
+    """
+    Create a requests session with retry logic.
+
+    requests is HTTP/1.1 only, so the pool keeps one keep-alive connection
+    per download worker; after the first batch every worker reuses a warm
+    TLS connection instead of multiplexing streams over one.
+    """
     session = requests.Session()
     retry = Retry(
         total=Config.MAX_RETRIES,
         backoff_factor=0.3,
         status_forcelist=[500, 502, 503, 504]
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=Config.DOWNLOAD_WORKERS)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
 
 http_session = create_session()
 
+# Shared by all requests so concurrent batch downloads stay bounded
+download_executor = ThreadPoolExecutor(
+    max_workers=Config.DOWNLOAD_WORKERS,
+    thread_name_prefix="download"
+)
+
 
 # -------------------- FLASK APP --------------------
 
+class ORJSONProvider(JSONProvider):
+    """Serve and parse JSON with orjson, which writes bytes directly."""
+    
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=self.option).decode()
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        # Same arguments as jsonify(): one positional value, several as a
+        # list, or keyword arguments as an object
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = list(args) if args else kwargs or None
+        # Skip the bytes -> str -> bytes round trip of the base implementation
+        body = orjson.dumps(obj, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype="application/json")
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 
@@ -169,6 +287,15 @@ def validate_bounds(bounds: Dict[str, float]) -> None:
     
     west, south, east, north = bounds["west"], bounds["south"], bounds["east"], bounds["north"]
     
+    for key, value in (("west", west), ("south", south), ("east", east), ("north", north)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValidationError(f"bounds.{key} must be a number")
+    
+    # Valid bounds pass in one expression; the checks below only build the message
+    if (Config.MIN_LON <= west < east <= Config.MAX_LON and
+            Config.MIN_LAT <= south < north <= Config.MAX_LAT):
+        return
+    
     if not (Config.MIN_LON <= west <= Config.MAX_LON):
         raise ValidationError(f"Invalid west longitude: {west}")
     if not (Config.MIN_LON <= east <= Config.MAX_LON):
@@ -184,12 +311,25 @@ def validate_bounds(bounds: Dict[str, float]) -> None:
         raise ValidationError("south must be less than north")
 
 
+# Subdomains of an allowed domain are allowed too
+ALLOWED_HOST_SUFFIXES = tuple("." + domain for domain in Config.ALLOWED_DOMAINS)
+
+
 def validate_url(url: str) -> None:
     """Validate URL is from allowed domains (SSRF protection)."""
     if not url.startswith(("http://", "https://")):
         raise ValidationError("URL must start with http:// or https://")
     
-    if not any(domain in url for domain in Config.ALLOWED_DOMAINS):
+    try:
+        hostname = urlsplit(url).hostname
+    except ValueError:
+        raise ValidationError("Invalid URL")
+    
+    # Match the parsed hostname, not the raw string, so that
+    # evil-noaa.gov.attacker.com or attacker.com/?noaa.gov are rejected
+    if not hostname or not (
+        hostname in Config.ALLOWED_DOMAINS or hostname.endswith(ALLOWED_HOST_SUFFIXES)
+    ):
         raise ValidationError(
             f"URL domain not allowed. Allowed domains: {Config.ALLOWED_DOMAINS}"
         )
@@ -239,9 +379,30 @@ def require_auth(f):
 
 # -------------------- HELPERS --------------------
 
+def get_json_body() -> Any:
+    """Parse the request's JSON body, inflating it first if sent with Content-Encoding: gzip."""
+    if request.content_encoding != "gzip":
+        return request.get_json() or {}
+    
+    # Cap the inflated size too, so a small compressed body can't expand unbounded
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        raw = inflater.decompress(request.get_data(), Config.MAX_CONTENT_LENGTH)
+    except zlib.error:
+        raise ValidationError("Invalid gzip request body")
+    if inflater.unconsumed_tail:
+        raise ValidationError(f"Request body exceeds {Config.MAX_CONTENT_LENGTH} bytes when decompressed")
+    
+    try:
+        return app.json.loads(raw) or {}
+    except ValueError:
+        raise ValidationError("Invalid JSON request body")
+
+
 def url_hash(url: str) -> str:
     """Generate a hash of a URL for duplicate detection."""
-    return hashlib.sha256(url.encode()).hexdigest()[:16]
+    # Same value as sha256(...).hexdigest()[:16], without hex-encoding all 32 bytes
+    return hashlib.sha256(url.encode()).digest()[:8].hex()
 
 
 def download_image(url: str) -> Image.Image:
@@ -249,46 +410,249 @@ def download_image(url: str) -> Image.Image:
     logger.info(f"Downloading image from {url}")
     
     try:
-        resp = http_session.get(url, timeout=Config.DOWNLOAD_TIMEOUT)
+        resp = http_session.get(url, timeout=Config.DOWNLOAD_TIMEOUT, stream=True)
+    except requests.exceptions.Timeout:
+        raise Exception(f"Timeout downloading image from {url}")
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Failed to download image: {str(e)}")
+    
+    try:
         resp.raise_for_status()
+        
+        # Refuse oversized images before reading, and again while reading in
+        # case Content-Length is missing or wrong
+        declared = int(resp.headers.get("Content-Length") or 0)
+        if declared > Config.MAX_CONTENT_LENGTH:
+            raise Exception(f"Image too large: {declared} bytes")
+        
+        image_bytes = io.BytesIO()
+        for chunk in resp.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+            image_bytes.write(chunk)
+            if image_bytes.tell() > Config.MAX_CONTENT_LENGTH:
+                raise Exception(f"Image too large: over {Config.MAX_CONTENT_LENGTH} bytes")
     except requests.exceptions.Timeout:
         raise Exception(f"Timeout downloading image from {url}")
     except requests.exceptions.RequestException as e:
         raise Exception(f"Failed to download image: {str(e)}")
+    finally:
+        resp.close()
     
     try:
-        image_bytes = io.BytesIO(resp.content)
-        img = Image.open(image_bytes).convert("RGB")
+        image_bytes.seek(0)
+        img = Image.open(image_bytes)
+        # Let JPEG decode at a reduced DCT scale when the image is much larger
+        # than CLIP's input; no-op for other formats and for 256px tiles
+        img.draft("RGB", (Config.CLIP_INPUT_SIZE, Config.CLIP_INPUT_SIZE))
+        # Decode here so a corrupt tile fails on its own, not the whole encode batch
+        img.load()
+        if img.mode != "RGB":
+            img = img.convert("RGB")
         logger.info(f"Image downloaded successfully, size: {img.size}")
         return img
     except Exception as e:
         raise Exception(f"Failed to open image: {str(e)}")
 
 
-def encode_image(img: Image.Image) -> List[float]:
-    """Generate a CLIP embedding for an image."""
-    logger.info("Encoding image with CLIP")
-    start_time = datetime.now()
+def download_images(urls: List[str]) -> List[Any]:
+    """
+    Download many images concurrently on the shared download pool.
+
+    Returns one entry per URL, in order: the PIL Image, or the exception
+    raised while downloading it.
+    """
+    def fetch(url: str) -> Any:
+        try:
+            return download_image(url)
+        except Exception as e:
+            return e
     
-    embedding = clip_model.encode(img, normalize_embeddings=True)
+    return list(download_executor.map(fetch, urls))
+
+
+def encode_images(imgs: List[Image.Image]) -> np.ndarray:
+    """Generate CLIP embeddings (one float32 row per image) in one forward pass."""
+    logger.info(f"Encoding {len(imgs)} images with CLIP")
+    start_ns = time.perf_counter_ns()
     
-    elapsed = (datetime.now() - start_time).total_seconds()
-    logger.info(f"Image encoded in {elapsed:.2f}s")
+    with torch.inference_mode():
+        embeddings = clip_model.encode(
+            imgs,
+            batch_size=Config.CLIP_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+    
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    logger.info(f"{len(imgs)} images encoded in {elapsed:.2f}s")
     
-    return embedding.tolist()
+    return embeddings.astype(np.float32, copy=False)
 
 
-def encode_text(text: str) -> List[float]:
-    """Generate a CLIP embedding for text."""
-    logger.info(f"Encoding text query: '{text}'")
-    start_time = datetime.now()
+class TextEncodeBatcher:
+    """
+    Coalesces text encodes from concurrent requests into one CLIP forward pass.
+
+    Request threads block on a Future while a single background thread
+    collects up to max_batch queries, waiting at most max_wait seconds for
+    the batch to fill. Under load this runs one batched encode instead of
+    one per gunicorn thread; an idle request only pays max_wait.
+    """
     
-    embedding = clip_model.encode(text, normalize_embeddings=True)
+    def __init__(self, max_batch: int, max_wait: float):
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="text-encode", daemon=True)
+        self._thread.start()
     
-    elapsed = (datetime.now() - start_time).total_seconds()
-    logger.info(f"Text encoded in {elapsed:.2f}s")
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text, sharing a forward pass with concurrent callers."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                with torch.inference_mode():
+                    embeddings = clip_model.encode(
+                        [text for text, _ in batch],
+                        batch_size=len(batch),
+                        normalize_embeddings=True,
+                        convert_to_numpy=True
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            if len(batch) > 1:
+                logger.info(f"Encoded {len(batch)} text queries in one batch")
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+# The thread is started per process, so gunicorn must not --preload the app
+text_batcher = TextEncodeBatcher(Config.TEXT_BATCH_SIZE, Config.TEXT_BATCH_WAIT)
+
+
+@lru_cache(maxsize=Config.TEXT_CACHE_SIZE)
+def _encode_text_cached(text: str) -> np.ndarray:
+    # Copy out of the shared batch array so the cache holds only this row
+    embedding = np.array(text_batcher.encode(text), dtype=np.float32)
+    # Shared between callers via the cache, so make it immutable
+    embedding.setflags(write=False)
+    return embedding
+
+
+def encode_text(text: str) -> np.ndarray:
+    """Generate a CLIP embedding for text, cached by normalized query."""
+    # CLIP's tokenizer lowercases and collapses whitespace, so these
+    # spellings already produce the same embedding
+    normalized = " ".join(text.split()).lower()
+    logger.info(f"Encoding text query: '{normalized}'")
+    start_ns = time.perf_counter_ns()
+    
+    embedding = _encode_text_cached(normalized)
+    
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    info = _encode_text_cached.cache_info()
+    logger.info(
+        f"Text encoded in {elapsed:.2f}s "
+        f"(cache hits {info.hits}/{info.hits + info.misses})"
+    )
+    
+    return embedding
+
+
+def roi_mask(metadatas: List[Dict[str, Any]], roi: Dict[str, float]) -> np.ndarray:
+    """Boolean mask of which metadata records have their center inside the ROI."""
+    def column(key: str) -> np.ndarray:
+        values = (m.get(key) for m in metadatas)
+        return np.fromiter(
+            (np.nan if v is None else v for v in values),
+            dtype=np.float64,
+            count=len(metadatas)
+        )
     
-    return embedding.tolist()
+    lat = column("center_lat")
+    lon = column("center_lon")
+    # Missing centers are NaN, which fails every comparison
+    return (
+        (lat >= roi["south"]) & (lat <= roi["north"]) &
+        (lon >= roi["west"]) & (lon <= roi["east"])
+    )
+
+
+def roi_where(roi: Dict[str, float]) -> Dict[str, Any]:
+    """Chroma metadata filter matching records whose center is inside the ROI."""
+    return {"$and": [
+        {"center_lat": {"$gte": roi["south"]}},
+        {"center_lat": {"$lte": roi["north"]}},
+        {"center_lon": {"$gte": roi["west"]}},
+        {"center_lon": {"$lte": roi["east"]}},
+    ]}
+
+
+def query_chroma(
+    q_emb: np.ndarray,
+    k: int,
+    roi: Optional[Dict[str, float]] = None
+) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """
+    Return metadata and distances of the k nearest records, inside the ROI if given.
+
+    The ROI is pushed into Chroma's where filter so only matching neighbours
+    are returned. Chroma versions that reject $and filters fall back to
+    over-fetching and filtering in Python.
+    """
+    include = ["metadatas", "distances"]
+    
+    if roi:
+        try:
+            result = chroma_collection.query(
+                query_embeddings=[q_emb],
+                n_results=k,
+                where=roi_where(roi),
+                include=include,
+            )
+            return result.get("metadatas", [[]])[0], result.get("distances", [[]])[0]
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Chroma ROI filter not supported, filtering in Python: {e}")
+        
+        result = chroma_collection.query(
+            query_embeddings=[q_emb],
+            n_results=min(k * Config.ROI_MULTIPLIER, Config.MAX_RESULTS),
+            include=include,
+        )
+        metadatas = result.get("metadatas", [[]])[0]
+        distances = result.get("distances", [[]])[0]
+        
+        mask = roi_mask(metadatas, roi)
+        
+        # Keep the first k matches in distance order
+        keep = np.flatnonzero(mask)[:k]
+        return [metadatas[i] for i in keep], [distances[i] for i in keep]
+    
+    result = chroma_collection.query(
+        query_embeddings=[q_emb],
+        n_results=k,
+        include=include,
+    )
+    return result.get("metadatas", [[]])[0], result.get("distances", [[]])[0]
 
 
 def check_duplicate_url(tile_url: str) -> Optional[str]:
@@ -296,6 +660,21 @@ def check_duplicate_url(tile_url: str) -> Optional[str]:
     url_hash_value = url_hash(tile_url)
     
     try:
+        # Keyed read on the companion URL index
+        index_ref = db.collection(Config.URL_INDEX_COLLECTION).document(url_hash_value)
+        doc = index_ref.get()
+        if doc.exists:
+            existing_id = doc.to_dict().get("image_id")
+            # Entries go stale when their image is re-indexed with another URL
+            # or deleted, so only trust one whose tile still carries this hash
+            tile = db.collection(Config.COLLECTION_NAME).document(existing_id).get() if existing_id else None
+            if tile is not None and tile.exists and tile.to_dict().get("url_hash") == url_hash_value:
+                logger.info(f"Found duplicate URL, existing image_id: {existing_id}")
+                return existing_id
+            logger.info(f"Removing stale URL index entry for {existing_id}")
+            index_ref.delete()
+        
+        # Tiles indexed before the URL index existed only have the url_hash field
         docs = db.collection(Config.COLLECTION_NAME).where("url_hash", "==", url_hash_value).limit(1).get()
         if docs:
             existing_id = docs[0].id
@@ -307,58 +686,73 @@ def check_duplicate_url(tile_url: str) -> Optional[str]:
     return None
 
 
-def upsert_firestore_doc(meta: Dict[str, Any]) -> None:
-    """Create/overwrite a Firestore document for a tile."""
-    image_id = meta["image_id"]
+def upsert_firestore_doc(metas: Union[Dict[str, Any], List[Dict[str, Any]]]) -> None:
+    """
+    Create/overwrite Firestore documents (and their URL index entries) for one
+    tile or a list of tiles, using batched writes.
+    """
+    if isinstance(metas, dict):
+        metas = [metas]
+    collection = db.collection(Config.COLLECTION_NAME)
+    url_index = db.collection(Config.URL_INDEX_COLLECTION)
+    # Each tile is two writes: its document and its URL index entry
+    chunk = Config.FIRESTORE_BATCH_LIMIT // 2
     
     try:
-        db.collection(Config.COLLECTION_NAME).document(image_id).set(meta)
-        logger.info(f"Firestore document upserted: {image_id}")
+        for start in range(0, len(metas), chunk):
+            batch = db.batch()
+            for meta in metas[start:start + chunk]:
+                batch.set(collection.document(meta["image_id"]), meta)
+                batch.set(url_index.document(meta["url_hash"]), {"image_id": meta["image_id"]})
+            batch.commit()
+        logger.info(f"Firestore documents upserted: {len(metas)}")
     except Exception as e:
-        logger.error(f"Failed to upsert Firestore document: {e}")
+        logger.error(f"Failed to upsert Firestore documents: {e}")
         raise
 
 
-def upsert_chroma_record(meta: Dict[str, Any], embedding: List[float]) -> None:
-    """Add/update a record in Chroma."""
-    image_id = meta["image_id"]
+def upsert_chroma_records(metas: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+    """Add/update many records in Chroma in a single call."""
+    ids = [meta["image_id"] for meta in metas]
     
     # ChromaDB doesn't accept None values in metadata - filter them out
-    clean_meta = {k: v for k, v in meta.items() if v is not None}
+    clean_metas = [{k: v for k, v in meta.items() if v is not None} for meta in metas]
     
     try:
         # Try upsert first (ChromaDB 0.4.0+)
         chroma_collection.upsert(
-            ids=[image_id],
-            embeddings=[embedding],
-            metadatas=[clean_meta],
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=clean_metas,
         )
-        logger.info(f"Chroma record upserted: {image_id}")
+        logger.info(f"Chroma records upserted: {len(ids)}")
     except AttributeError:
         # Fallback for older ChromaDB versions
         logger.warning("Chroma upsert not available, using delete+add")
         try:
-            chroma_collection.delete(ids=[image_id])
+            chroma_collection.delete(ids=ids)
         except Exception as e:
-            logger.debug(f"Delete failed (record may not exist): {e}")
+            logger.debug(f"Delete failed (records may not exist): {e}")
         
         chroma_collection.add(
-            ids=[image_id],
-            embeddings=[embedding],
-            metadatas=[clean_meta],
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=clean_metas,
         )
-        logger.info(f"Chroma record added: {image_id}")
+        logger.info(f"Chroma records added: {len(ids)}")
     except Exception as e:
-        logger.error(f"Failed to upsert Chroma record: {e}")
+        logger.error(f"Failed to upsert Chroma records: {e}")
         raise
 
 
-def rollback_index(image_id: str) -> None:
+def rollback_index(image_id: str, url_hash_value: Optional[str] = None) -> None:
     """Rollback indexing operation if something fails."""
     logger.warning(f"Rolling back index for {image_id}")
     
     try:
         db.collection(Config.COLLECTION_NAME).document(image_id).delete()
+        if url_hash_value:
+            db.collection(Config.URL_INDEX_COLLECTION).document(url_hash_value).delete()
         logger.info(f"Firestore document deleted: {image_id}")
     except Exception as e:
         logger.error(f"Failed to delete Firestore document during rollback: {e}")
@@ -370,6 +764,112 @@ def rollback_index(image_id: str) -> None:
         logger.error(f"Failed to delete Chroma record during rollback: {e}")
 
 
+def build_tile_meta(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a tile descriptor and build its metadata record."""
+    required_fields = ["image_id", "tile_url", "bounds"]
+    for f in required_fields:
+        if f not in data:
+            raise ValidationError(f"Missing field: {f}")
+    
+    image_id = data["image_id"]
+    tile_url = data["tile_url"]
+    bounds = data["bounds"]
+    timestamp = data.get("timestamp")
+    thumb_url = data.get("thumb_url")
+    extra_metadata = data.get("metadata", {})
+    
+    # Validate inputs
+    validate_image_id(image_id)
+    validate_url(tile_url)
+    validate_bounds(bounds)
+    
+    if thumb_url:
+        validate_url(thumb_url)
+    
+    # Compute center point
+    center_lat = (bounds["south"] + bounds["north"]) / 2.0
+    center_lon = (bounds["west"] + bounds["east"]) / 2.0
+    
+    return {
+        "image_id": image_id,
+        "tile_url": tile_url,
+        "thumb_url": thumb_url,
+        "url_hash": url_hash(tile_url),
+        "west": bounds["west"],
+        "south": bounds["south"],
+        "east": bounds["east"],
+        "north": bounds["north"],
+        "center_lat": center_lat,
+        "center_lon": center_lon,
+        "timestamp": timestamp,
+        "indexed_at": datetime.utcnow().isoformat() + "Z",
+        **extra_metadata
+    }
+
+
+def index_tile_metas(metas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Download, encode and store a batch of validated tiles.
+
+    Returns one result per tile, in input order. Duplicate URLs are skipped
+    and download failures only fail their own tile; a storage failure rolls
+    back the whole batch and raises.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(metas)
+    to_download: List[Tuple[int, Dict[str, Any]]] = []
+    seen_hashes: Dict[str, str] = {}
+    
+    for i, meta in enumerate(metas):
+        image_id = meta["image_id"]
+        
+        # Check for duplicate URL, both in the index and earlier in this batch
+        existing_id = seen_hashes.get(meta["url_hash"]) or check_duplicate_url(meta["tile_url"])
+        if existing_id and existing_id != image_id:
+            logger.warning(f"Duplicate URL detected, existing ID: {existing_id}")
+            results[i] = {
+                "image_id": image_id,
+                "warning": "URL already indexed",
+                "existing_image_id": existing_id,
+                "action": "skipped"
+            }
+            continue
+        seen_hashes[meta["url_hash"]] = image_id
+        to_download.append((i, meta))
+    
+    pending: List[Tuple[int, Dict[str, Any], Image.Image]] = []
+    images = download_images([meta["tile_url"] for _, meta in to_download])
+    for (i, meta), img in zip(to_download, images):
+        if isinstance(img, Exception):
+            logger.error(f"Download failed for {meta['image_id']}: {img}")
+            results[i] = {"image_id": meta["image_id"], "error": str(img)}
+        else:
+            pending.append((i, meta, img))
+    
+    if pending:
+        indexed_metas = [meta for _, meta, _ in pending]
+        embeddings = encode_images([img for _, _, img in pending])
+        
+        # Index with rollback on failure
+        try:
+            upsert_firestore_doc(indexed_metas)
+            upsert_chroma_records(indexed_metas, embeddings)
+        except Exception as e:
+            logger.error(f"Indexing failed, rolling back: {e}")
+            for meta in indexed_metas:
+                rollback_index(meta["image_id"], meta["url_hash"])
+            raise
+        
+        for i, meta, _ in pending:
+            logger.info(f"Successfully indexed: {meta['image_id']}")
+            results[i] = {
+                "status": "indexed",
+                "image_id": meta["image_id"],
+                "center": {"lat": meta["center_lat"], "lon": meta["center_lon"]}
+            }
+    
+    return results
+
+
 def check_firestore_health() -> bool:
     """Check Firestore connectivity."""
     try:
@@ -396,15 +896,15 @@ def check_chroma_health() -> bool:
 @app.before_request
 def before_request():
     """Log request details."""
-    g.start_time = datetime.now()
+    g.start_ns = time.perf_counter_ns()
     logger.info(f"{request.method} {request.path} from {get_remote_address()}")
 
 
 @app.after_request
 def after_request(response):
     """Log response details."""
-    if hasattr(g, 'start_time'):
-        elapsed = (datetime.now() - g.start_time).total_seconds()
+    if hasattr(g, 'start_ns'):
+        elapsed = (time.perf_counter_ns() - g.start_ns) / 1e9
         logger.info(f"{request.method} {request.path} completed in {elapsed:.2f}s with status {response.status_code}")
     return response
 
@@ -475,85 +975,84 @@ def index_tile():
     }
     """
     try:
-        data = request.get_json() or {}
-        
-        # Validate required fields
-        required_fields = ["image_id", "tile_url", "bounds"]
-        for f in required_fields:
-            if f not in data:
-                raise ValidationError(f"Missing field: {f}")
-        
-        image_id = data["image_id"]
-        tile_url = data["tile_url"]
-        bounds = data["bounds"]
-        timestamp = data.get("timestamp")
-        thumb_url = data.get("thumb_url")
-        extra_metadata = data.get("metadata", {})
-        
-        # Validate inputs
-        validate_image_id(image_id)
-        validate_url(tile_url)
-        validate_bounds(bounds)
+        data = get_json_body()
+        meta = build_tile_meta(data)
         
-        if thumb_url:
-            validate_url(thumb_url)
+        result = index_tile_metas([meta])[0]
         
-        # Check for duplicate URL
-        existing_id = check_duplicate_url(tile_url)
-        if existing_id and existing_id != image_id:
-            logger.warning(f"Duplicate URL detected, existing ID: {existing_id}")
-            return jsonify({
-                "warning": "URL already indexed",
-                "existing_image_id": existing_id,
-                "action": "skipped"
-            }), 200
-        
-        # Compute center point
-        center_lat = (bounds["south"] + bounds["north"]) / 2.0
-        center_lon = (bounds["west"] + bounds["east"]) / 2.0
-        
-        # Download and encode image
-        img = download_image(tile_url)
-        embedding = encode_image(img)
-        
-        # Prepare metadata
-        meta = {
-            "image_id": image_id,
-            "tile_url": tile_url,
-            "thumb_url": thumb_url,
-            "url_hash": url_hash(tile_url),
-            "west": bounds["west"],
-            "south": bounds["south"],
-            "east": bounds["east"],
-            "north": bounds["north"],
-            "center_lat": center_lat,
-            "center_lon": center_lon,
-            "timestamp": timestamp,
-            "indexed_at": datetime.utcnow().isoformat() + "Z",
-            **extra_metadata
-        }
+        if "error" in result:
+            return jsonify({"error": f"Failed to index tile: {result['error']}"}), 500
+        if result.get("action") == "skipped":
+            return jsonify(result), 200
+        return jsonify(result), 201
         
-        # Index with rollback on failure
-        try:
-            upsert_firestore_doc(meta)
-            upsert_chroma_record(meta, embedding)
-        except Exception as e:
-            logger.error(f"Indexing failed, rolling back: {e}")
-            rollback_index(image_id)
-            raise
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error(f"Index operation failed: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to index tile: {str(e)}"}), 500
+
+
+@app.route("/index_tiles", methods=["POST"])
+@require_auth
+@limiter.limit(Config.RATE_LIMIT_INDEX)
+def index_tiles():
+    """
+    Admin endpoint to index many NOAA tiles in one request.
+
+    Images are downloaded per tile, then encoded with CLIP in batches and
+    written to Firestore and Chroma in bulk.
+
+    Headers:
+      X-Index-Token: <INDEX_TOKEN>   (or Authorization: Bearer <INDEX_TOKEN>)
+
+    Body JSON:
+    {
+      "tiles": [
+        { ...same fields as /index_tile... },
+        ...
+      ]
+    }
+    """
+    try:
+        data = get_json_body()
+        tiles = data.get("tiles")
+        
+        if not isinstance(tiles, list) or not tiles:
+            raise ValidationError("tiles must be a non-empty list")
+        if len(tiles) > Config.MAX_BATCH_TILES:
+            raise ValidationError(f"Cannot index more than {Config.MAX_BATCH_TILES} tiles per request")
+        
+        # Validate everything before doing any work
+        metas = []
+        seen_ids = set()
+        for i, tile in enumerate(tiles):
+            if not isinstance(tile, dict):
+                raise ValidationError(f"tiles[{i}] must be an object")
+            try:
+                meta = build_tile_meta(tile)
+            except ValidationError as e:
+                raise ValidationError(f"tiles[{i}]: {e}")
+            # Chroma rejects repeated ids in one upsert
+            if meta["image_id"] in seen_ids:
+                raise ValidationError(f"tiles[{i}]: duplicate image_id")
+            seen_ids.add(meta["image_id"])
+            metas.append(meta)
+        
+        results = index_tile_metas(metas)
         
-        logger.info(f"Successfully indexed: {image_id}")
         return jsonify({
-            "status": "indexed",
-            "image_id": image_id,
-            "center": {"lat": center_lat, "lon": center_lon}
-        }), 201
+            "results": results,
+            "indexed": sum(1 for r in results if r.get("status") == "indexed"),
+            "skipped": sum(1 for r in results if r.get("action") == "skipped"),
+            "failed": sum(1 for r in results if "error" in r),
+        }), 200
         
     except ValidationError:
         raise
     except Exception as e:
-        logger.error(f"Index operation failed: {e}", exc_info=True)
-        return jsonify({"error": f"Failed to index tile: {str(e)}"}), 500
+        logger.error(f"Batch index operation failed: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to index tiles: {str(e)}"}), 500
 
 
 @app.route("/search_images", methods=["POST"])
@@ -575,7 +1074,7 @@ def search_images():
     }
     """
     try:
-        data = request.get_json() or {}
+        data = get_json_body()
         query = data.get("query", "").strip()
         
         if not query:
@@ -594,35 +1093,12 @@ def search_images():
         # Encode query
         q_emb = encode_text(query)
         
-        # Determine how many results to fetch
-        fetch_count = k * Config.ROI_MULTIPLIER if roi else k
-        fetch_count = min(fetch_count, Config.MAX_RESULTS)
-        
         # Query ChromaDB
-        logger.info(f"Querying ChromaDB for '{query}' with k={fetch_count}")
-        result = chroma_collection.query(
-            query_embeddings=[q_emb],
-            n_results=fetch_count,
-            include=["metadatas", "distances"],
-        )
-        
-        metadatas = result.get("metadatas", [[]])[0]
-        distances = result.get("distances", [[]])[0]
+        logger.info(f"Querying ChromaDB for '{query}' with k={k}")
+        metadatas, distances = query_chroma(q_emb, k, roi)
         
         hits = []
         for meta, dist in zip(metadatas, distances):
-            # ROI filtering
-            if roi:
-                lat = meta.get("center_lat")
-                lon = meta.get("center_lon")
-                if lat is None or lon is None:
-                    continue
-                
-                if not (roi["south"] <= lat <= roi["north"]):
-                    continue
-                if not (roi["west"] <= lon <= roi["east"]):
-                    continue
-            
             hits.append({
                 "image_id": meta.get("image_id"),
                 "tile_url": meta.get("tile_url"),
@@ -641,10 +1117,6 @@ def search_images():
                 "distance": dist,
                 "similarity": 1 - dist,  # Convert distance to similarity score
             })
-            
-            # Stop once we have enough results
-            if len(hits) >= k:
-                break
         
         logger.info(f"Returning {len(hits)} results for query '{query}'")
         
@@ -670,9 +1142,15 @@ def delete_image(image_id: str):
         validate_image_id(image_id)
         
         # Delete from Firestore
-        db.collection(Config.COLLECTION_NAME).document(image_id).delete()
+        doc_ref = db.collection(Config.COLLECTION_NAME).document(image_id)
+        doc = doc_ref.get()
+        doc_ref.delete()
         logger.info(f"Deleted from Firestore: {image_id}")
         
+        deleted_hash = doc.to_dict().get("url_hash") if doc.exists else None
+        if deleted_hash:
+            db.collection(Config.URL_INDEX_COLLECTION).document(deleted_hash).delete()
+        
         # Delete from ChromaDB
         chroma_collection.delete(ids=[image_id])
         logger.info(f"Deleted from ChromaDB: {image_id}")
@@ -699,10 +1177,16 @@ def stats():
             .get()
         
         recent_images = [doc.to_dict().get("image_id") for doc in recent_docs]
+        text_cache = _encode_text_cached.cache_info()
         
         return jsonify({
             "total_images": total_images,
             "recent_images": recent_images,
+            "text_cache": {
+                "hits": text_cache.hits,
+                "misses": text_cache.misses,
+                "size": text_cache.currsize,
+            },
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }), 200
         
@@ -0,0 +1,195 @@
+"""
+Helpers shared by test_index.py and test_search.py.
+"""
+
+import functools
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared session so every test reuses the same keep-alive connection
+# instead of paying a TCP + TLS handshake per request
+SESSION = requests.Session()
+adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+SESSION.mount("http://", adapter)
+SESSION.mount("https://", adapter)
+SESSION.headers.update({"Content-Type": "application/json"})
+
+# Set TEST_VERBOSE=1 to print full request and response bodies
+VERBOSE = os.environ.get("TEST_VERBOSE") == "1"
+
+# Successful health checks are remembered on disk so running test_index.py
+# and test_search.py back to back only probes the backend once
+HEALTH_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".health_cache.json")
+HEALTH_CACHE_TTL = 30
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# In-flight warm-up /health requests by base_url, picked up by health_check
+WARMUPS = {}
+
+
+def describe(body):
+    """Pretty-print a JSON body when VERBOSE, otherwise summarize its keys."""
+    if VERBOSE:
+        return orjson.dumps(body, option=orjson.OPT_INDENT_2).decode()
+    if isinstance(body, dict):
+        return f"keys={list(body)}"
+    return f"{type(body).__name__}"
+
+
+def cached_health(base_url):
+    """Return True if base_url passed a health check that is still fresh."""
+    try:
+        with open(HEALTH_CACHE_PATH) as f:
+            entry = json.load(f).get(base_url)
+    except (OSError, ValueError):
+        return False
+    return bool(entry) and time.time() - entry["ts"] < entry["ttl"]
+
+
+def save_health(base_url, response):
+    """Remember a successful health check, honoring Cache-Control max-age."""
+    match = MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    ttl = int(match.group(1)) if match else HEALTH_CACHE_TTL
+    try:
+        with open(HEALTH_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[base_url] = {"ts": time.time(), "ttl": ttl}
+    try:
+        with open(HEALTH_CACHE_PATH, "w") as f:
+            json.dump(cache, f)
+    except OSError:
+        pass  # Caching is best-effort
+
+
+@functools.lru_cache(maxsize=4)
+def health_check(base_url):
+    """
+    Check the health endpoint to verify the service is running. Memoized per
+    base_url, so scripts run in one process only probe each backend once.
+    """
+    print("\n" + "="*60)
+    print("HEALTH CHECK")
+    print("="*60)
+    
+    if cached_health(base_url):
+        print(f"\n✓ Service passed a recent health check (cached in {HEALTH_CACHE_PATH})")
+        return True
+    
+    print(f"\nRequest URL: {base_url}/health")
+    
+    try:
+        warmup = WARMUPS.pop(base_url, None)
+        if warmup is not None:
+            # Reuse the warm-up request rather than sending a second one,
+            # which could start a second instance on a cold service
+            response = warmup.result()
+        else:
+            response = SESSION.get(f"{base_url}/health", timeout=60)  # Increased timeout for cold start
+        print(f"Status Code: {response.status_code}")
+        body = orjson.loads(response.content)
+        print(f"Response: {describe(body)}")
+        
+        if response.status_code == 200:
+            print("\n✓ Service is healthy and running!")
+            save_health(base_url, response)
+            return True
+        else:
+            print("\n✗ Service returned non-200 status")
+            return False
+            
+    except Exception as e:
+        print(f"\n✗ Cannot connect to service: {str(e)}")
+        print(f"\nMake sure:")
+        print(f"  1. Your backend is running")
+        print(f"  2. BASE_URL is correct: {base_url}")
+        return False
+
+
+def start_warmup(base_url):
+    """
+    Send the /health request in the background so a cold Cloud Run instance
+    starts booting while the script is still setting up. health_check waits
+    for this request and uses its response. Skipped if a recent health check
+    passed, since the instance is then most likely already up.
+    """
+    if cached_health(base_url):
+        return None
+
+    future = Future()
+
+    def ping():
+        try:
+            future.set_result(SESSION.get(f"{base_url}/health", timeout=60))
+        except Exception as e:
+            future.set_exception(e)  # health_check reports connection problems
+
+    WARMUPS[base_url] = future
+    threading.Thread(target=ping, name="warmup", daemon=True).start()
+    return future
+
+
+class ThreadBufferedStdout(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that sends writes from threads which have opted
+    in to a per-thread buffer, and everything else to the real stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def start_buffer(self):
+        self._local.buffer = io.StringIO()
+
+    def pop_buffer(self):
+        buffer = self._local.buffer
+        self._local.buffer = None
+        return buffer.getvalue()
+
+    def write(self, s):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self.stream).write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def run_concurrently(tests, max_workers=8):
+    """
+    Run independent test functions at the same time and print each one's
+    output as a block, in the order given, once they have all finished.
+
+    The tests are I/O-bound HTTP calls, so wall time drops to roughly the
+    slowest test instead of the sum.
+    """
+    stdout = ThreadBufferedStdout(sys.stdout)
+
+    def run(test):
+        stdout.start_buffer()
+        try:
+            test()
+        except Exception as e:
+            print(f"\n✗ {test.__name__} crashed: {str(e)}")
+        return stdout.pop_buffer()
+
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(run, tests))
+    finally:
+        sys.stdout = stdout.stream
+
+    for output in outputs:
+        sys.stdout.write(output)
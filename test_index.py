@@ -2,18 +2,29 @@
 Test script for the /index_tile endpoint.
 
 Usage:
-    python test_index.py
+    python test_index.py [--base-url URL] [--token TOKEN] [--mode skip|sample|custom]
+
+    --mode sample indexes SAMPLE_TILES (optionally only those inside --roi)
+    --mode custom indexes one tile described by --image-id, --tile-url and
+    --west/--south/--east/--north (plus optional --timestamp, --thumb-url)
 
 Before running:
     1. Make sure your backend is running (locally or on Cloud Run)
-    2. Update BASE_URL and INDEX_TOKEN below
+    2. Update BASE_URL and INDEX_TOKEN below, or pass --base-url / --token
     3. Have some NOAA tile URLs ready to index
 """
 
-import requests
-import json
+import argparse
+import gzip
+
+import numpy as np
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from test_common import SESSION, describe, health_check, run_concurrently, start_warmup
+
 
 # -------------------- CONFIG --------------------
 
@@ -24,173 +35,164 @@ BASE_URL = "https://melissa-backend-501310932916.us-central1.run.app"  # For Clo
 # Update this to match your INDEX_TOKEN environment variable
 INDEX_TOKEN = "nF1tRrYPGwE7cv598Ke2AHmNQjIV3BZ4"  # Must match the token set in your backend
 
+# Auth headers, built once; Content-Type is set on SESSION
+INDEX_HEADERS = {"X-Index-Token": INDEX_TOKEN}
+BEARER_HEADERS = {"Authorization": f"Bearer {INDEX_TOKEN}"}
+WRONG_TOKEN_HEADERS = {"X-Index-Token": "wrong-token"}
+
+# Concurrent index requests in test_index_multiple_tiles
+MAX_WORKERS = 8
+BATCH_SIZE = 32  # Tiles per /index_tiles request (the backend allows up to 100)
+print_lock = threading.Lock()
+
 # -------------------- SAMPLE TILE DATA --------------------
 
 # Real NOAA Hurricane Melissa tiles from Jamaica
 # URL format: https://stormscdn.ngs.noaa.gov/20251031a-rgb/{z}/{x}/{y}
 # Flight date: October 31, 2025 (Flight A - RGB imagery)
 
+SAMPLE_TILE_IDS = [
+    "melissa_20251031_001",
+    "melissa_20251031_002",
+    "melissa_20251031_003",
+    "melissa_20251031_004",
+    "melissa_20251031_005",
+]
+
+SAMPLE_TILE_URLS = [
+    "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148768/235444",
+    "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148768/235443",
+    "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148769/235444",
+    "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148769/235443",
+    "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148770/235444",
+]
+
+# One row per tile: west, south, east, north
+BOUNDS_FIELDS = ("west", "south", "east", "north")
+SAMPLE_BOUNDS = np.array([
+    [-77.3918, 18.1785, -77.3904, 18.1798],
+    [-77.3918, 18.1798, -77.3904, 18.1811],
+    [-77.3904, 18.1785, -77.3891, 18.1798],
+    [-77.3904, 18.1798, -77.3891, 18.1811],
+    [-77.3891, 18.1785, -77.3877, 18.1798],
+], dtype=np.float64)
+
+# Shared by every sample tile; serialized per tile but stored once
+MELISSA_META = {
+    "mission": "melissa",
+    "disaster_type": "hurricane",
+    "location": "Jamaica",
+    "flight": "20251031a",
+    "imagery_type": "rgb"
+}
+
 SAMPLE_TILES = [
     {
-        "image_id": "melissa_20251031_001",
-        "tile_url": "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148768/235444",
-        "thumb_url": None,
-        "bounds": {
-            "west": -77.3918,
-            "south": 18.1785,
-            "east": -77.3904,
-            "north": 18.1798
-        },
-        "timestamp": "2025-10-31T14:00:00Z",
-        "metadata": {
-            "mission": "melissa",
-            "disaster_type": "hurricane",
-            "location": "Jamaica",
-            "flight": "20251031a",
-            "imagery_type": "rgb"
-        }
-    },
-    {
-        "image_id": "melissa_20251031_002",
-        "tile_url": "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148768/235443",
-        "thumb_url": None,
-        "bounds": {
-            "west": -77.3918,
-            "south": 18.1798,
-            "east": -77.3904,
-            "north": 18.1811
-        },
-        "timestamp": "2025-10-31T14:00:00Z",
-        "metadata": {
-            "mission": "melissa",
-            "disaster_type": "hurricane",
-            "location": "Jamaica",
-            "flight": "20251031a",
-            "imagery_type": "rgb"
-        }
-    },
-    {
-        "image_id": "melissa_20251031_003",
-        "tile_url": "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148769/235444",
-        "thumb_url": None,
-        "bounds": {
-            "west": -77.3904,
-            "south": 18.1785,
-            "east": -77.3891,
-            "north": 18.1798
-        },
-        "timestamp": "2025-10-31T14:00:00Z",
-        "metadata": {
-            "mission": "melissa",
-            "disaster_type": "hurricane",
-            "location": "Jamaica",
-            "flight": "20251031a",
-            "imagery_type": "rgb"
-        }
-    },
-    {
-        "image_id": "melissa_20251031_004",
-        "tile_url": "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148769/235443",
-        "thumb_url": None,
-        "bounds": {
-            "west": -77.3904,
-            "south": 18.1798,
-            "east": -77.3891,
-            "north": 18.1811
-        },
-        "timestamp": "2025-10-31T14:00:00Z",
-        "metadata": {
-            "mission": "melissa",
-            "disaster_type": "hurricane",
-            "location": "Jamaica",
-            "flight": "20251031a",
-            "imagery_type": "rgb"
-        }
-    },
-    {
-        "image_id": "melissa_20251031_005",
-        "tile_url": "https://stormscdn.ngs.noaa.gov/20251031a-rgb/19/148770/235444",
+        "image_id": image_id,
+        "tile_url": tile_url,
         "thumb_url": None,
-        "bounds": {
-            "west": -77.3891,
-            "south": 18.1785,
-            "east": -77.3877,
-            "north": 18.1798
-        },
+        "bounds": dict(zip(BOUNDS_FIELDS, row)),
         "timestamp": "2025-10-31T14:00:00Z",
-        "metadata": {
-            "mission": "melissa",
-            "disaster_type": "hurricane",
-            "location": "Jamaica",
-            "flight": "20251031a",
-            "imagery_type": "rgb"
-        }
+        "metadata": MELISSA_META
     }
+    for image_id, tile_url, row in zip(SAMPLE_TILE_IDS, SAMPLE_TILE_URLS, SAMPLE_BOUNDS.tolist())
 ]
 
 
-# -------------------- TEST FUNCTIONS --------------------
+def sample_tiles_in_roi(west, south, east, north):
+    """Return the sample tiles that lie entirely inside the given bounding box."""
+    mask = (
+        (SAMPLE_BOUNDS[:, 0] >= west) & (SAMPLE_BOUNDS[:, 1] >= south) &
+        (SAMPLE_BOUNDS[:, 2] <= east) & (SAMPLE_BOUNDS[:, 3] <= north)
+    )
+    return [SAMPLE_TILES[i] for i in np.flatnonzero(mask)]
 
-def test_health_check():
-    """Test the health endpoint to verify service is running."""
-    print("\n" + "="*60)
-    print("HEALTH CHECK")
-    print("="*60)
-    
-    print(f"\nRequest URL: {BASE_URL}/health")
-    
-    try:
-        response = requests.get(f"{BASE_URL}/health", timeout=60)  # Increased timeout for cold start
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
-        
-        if response.status_code == 200:
-            print("\n✓ Service is healthy and running!")
-            return True
-        else:
-            print("\n✗ Service returned non-200 status")
-            return False
-            
-    except Exception as e:
-        print(f"\n✗ Cannot connect to service: {str(e)}")
-        print(f"\nMake sure:")
-        print(f"  1. Your backend is running")
-        print(f"  2. BASE_URL is correct: {BASE_URL}")
-        return False
 
+# -------------------- TEST FUNCTIONS --------------------
 
 def index_tile(tile_data, token):
     """Index a single tile."""
-    headers = {
-        "X-Index-Token": token,
-        "Content-Type": "application/json"
-    }
+    headers = INDEX_HEADERS if token == INDEX_TOKEN else {"X-Index-Token": token}
     
-    print(f"\n--- Indexing: {tile_data['image_id']} ---")
-    print(f"Tile URL: {tile_data['tile_url']}")
-    print(f"Bounds: {tile_data['bounds']}")
+    # Collect output and print it in one block so tiles indexed from
+    # several threads don't interleave their lines
+    lines = [
+        f"\n--- Indexing: {tile_data['image_id']} ---",
+        f"Tile URL: {tile_data['tile_url']}",
+        f"Bounds: {tile_data['bounds']}",
+    ]
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/index_tile",
             headers=headers,
-            json=tile_data,
+            data=orjson.dumps(tile_data),
             timeout=60  # Longer timeout for image processing
         )
         
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        lines.append(f"Status Code: {response.status_code}")
+        body = orjson.loads(response.content)
+        lines.append(f"Response: {describe(body)}")
         
-        if response.status_code == 200:
-            print(f"✓ Successfully indexed {tile_data['image_id']}")
+        # 201 = newly indexed, 200 = already indexed under another ID
+        if response.status_code in (200, 201):
+            lines.append(f"✓ Successfully indexed {tile_data['image_id']}")
             return True
         else:
-            print(f"✗ Failed to index: {response.json().get('error')}")
+            lines.append(f"✗ Failed to index: {body.get('error')}")
             return False
             
     except Exception as e:
-        print(f"✗ Request failed: {str(e)}")
+        lines.append(f"✗ Request failed: {str(e)}")
         return False
+    finally:
+        with print_lock:
+            print("\n".join(lines))
+
+
+def index_tiles_batch(tiles, token, chunk=BATCH_SIZE):
+    """Index tiles through /index_tiles, chunk tiles per request. Returns the success count."""
+    headers = INDEX_HEADERS if token == INDEX_TOKEN else {"X-Index-Token": token}
+    
+    def send(batch):
+        lines = [f"\n--- Indexing batch: {batch[0]['image_id']} .. {batch[-1]['image_id']} ({len(batch)} tiles) ---"]
+        
+        try:
+            # Tile JSON repeats the same keys and metadata, so it gzips well
+            response = SESSION.post(
+                f"{BASE_URL}/index_tiles",
+                headers={**headers, "Content-Encoding": "gzip"},
+                data=gzip.compress(orjson.dumps({"tiles": batch})),
+                timeout=120  # Whole batch is downloaded and encoded in one request
+            )
+            
+            lines.append(f"Status Code: {response.status_code}")
+            body = orjson.loads(response.content)
+            lines.append(f"Response: {describe(body)}")
+            
+            if response.status_code != 200:
+                lines.append(f"✗ Failed to index batch: {body.get('error')}")
+                return 0
+            
+            success_count = 0
+            for result in body.get("results", []):
+                if "error" in result:
+                    lines.append(f"✗ Failed to index {result.get('image_id')}: {result['error']}")
+                else:
+                    lines.append(f"✓ Successfully indexed {result.get('image_id')}")
+                    success_count += 1
+            return success_count
+            
+        except Exception as e:
+            lines.append(f"✗ Request failed: {str(e)}")
+            return 0
+        finally:
+            with print_lock:
+                print("\n".join(lines))
+    
+    batches = [tiles[i:i + chunk] for i in range(0, len(tiles), chunk)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return sum(executor.map(send, batches))
 
 
 def test_index_single_tile():
@@ -214,21 +216,23 @@ def test_index_single_tile():
     return index_tile(tile, INDEX_TOKEN)
 
 
-def test_index_multiple_tiles():
+def test_index_multiple_tiles(tiles=SAMPLE_TILES):
     """Test indexing multiple tiles from the sample list."""
     print("\n" + "="*60)
     print("TEST 2: Index Multiple Tiles")
     print("="*60)
     
-    print(f"\nIndexing {len(SAMPLE_TILES)} tiles...")
+    print(f"\nIndexing {len(tiles)} tiles...")
+    
+    # Tiles without their own capture time share one timestamp for the run
+    now = datetime.utcnow().isoformat() + "Z"
+    tiles = [tile if tile.get("timestamp") else {**tile, "timestamp": now} for tile in tiles]
     
-    success_count = 0
-    for tile in SAMPLE_TILES:
-        if index_tile(tile, INDEX_TOKEN):
-            success_count += 1
+    # One /index_tiles request per BATCH_SIZE tiles, sent concurrently
+    success_count = index_tiles_batch(tiles, INDEX_TOKEN)
     
     print(f"\n{'='*60}")
-    print(f"Results: {success_count}/{len(SAMPLE_TILES)} tiles indexed successfully")
+    print(f"Results: {success_count}/{len(tiles)} tiles indexed successfully")
     print(f"{'='*60}")
 
 
@@ -238,11 +242,6 @@ def test_invalid_auth():
     print("TEST 3: Invalid Authentication")
     print("="*60)
     
-    headers = {
-        "X-Index-Token": "wrong-token",
-        "Content-Type": "application/json"
-    }
-    
     tile = {
         "image_id": "test_auth",
         "tile_url": "https://example.com/tile.png",
@@ -257,15 +256,16 @@ def test_invalid_auth():
     print("\nUsing invalid token: 'wrong-token'")
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/index_tile",
-            headers=headers,
-            json=tile,
+            headers=WRONG_TOKEN_HEADERS,
+            data=orjson.dumps(tile),
             timeout=30
         )
         
         print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        body = orjson.loads(response.content)
+        print(f"Response: {describe(body)}")
         
         if response.status_code == 401:
             print("\n✓ Correctly rejected invalid token")
@@ -314,24 +314,20 @@ def test_missing_fields():
         }
     ]
     
-    headers = {
-        "X-Index-Token": INDEX_TOKEN,
-        "Content-Type": "application/json"
-    }
-    
     for test in test_cases:
         print(f"\n--- {test['name']} ---")
         
         try:
-            response = requests.post(
+            response = SESSION.post(
                 f"{BASE_URL}/index_tile",
-                headers=headers,
-                json=test['data'],
+                headers=INDEX_HEADERS,
+                data=orjson.dumps(test['data']),
                 timeout=30
             )
             
             print(f"Status Code: {response.status_code}")
-            print(f"Response: {json.dumps(response.json(), indent=2)}")
+            body = orjson.loads(response.content)
+            print(f"Response: {describe(body)}")
             
             if response.status_code == 400:
                 print(f"✓ Correctly returned validation error")
@@ -348,11 +344,6 @@ def test_with_bearer_token():
     print("TEST 5: Bearer Token Authentication")
     print("="*60)
     
-    headers = {
-        "Authorization": f"Bearer {INDEX_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
     tile = {
         "image_id": "test_bearer_auth",
         "tile_url": "https://example.com/tile.png",
@@ -367,15 +358,16 @@ def test_with_bearer_token():
     print("\nUsing Bearer token in Authorization header")
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/index_tile",
-            headers=headers,
-            json=tile,
+            headers=BEARER_HEADERS,
+            data=orjson.dumps(tile),
             timeout=30
         )
         
         print(f"Status Code: {response.status_code}")
-        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        body = orjson.loads(response.content)
+        print(f"Response: {describe(body)}")
         
         if response.status_code in [200, 500]:  # 500 if URL is invalid, which is ok for auth test
             print("\n✓ Bearer token authentication works")
@@ -386,80 +378,122 @@ def test_with_bearer_token():
         print(f"\n✗ Request failed: {str(e)}")
 
 
-def index_custom_tile():
-    """Interactive function to index a custom tile."""
+def index_custom_tile(args):
+    """Index a custom tile described on the command line."""
     print("\n" + "="*60)
     print("INDEX CUSTOM TILE")
     print("="*60)
     
-    print("\nEnter tile details:")
-    
     tile = {
-        "image_id": input("Image ID: ").strip(),
-        "tile_url": input("Tile URL: ").strip(),
+        "image_id": args.image_id,
+        "tile_url": args.tile_url,
         "bounds": {
-            "west": float(input("West longitude: ")),
-            "south": float(input("South latitude: ")),
-            "east": float(input("East longitude: ")),
-            "north": float(input("North latitude: "))
-        }
+            "west": args.west,
+            "south": args.south,
+            "east": args.east,
+            "north": args.north
+        },
+        "timestamp": args.timestamp or datetime.utcnow().isoformat() + "Z"
     }
     
-    timestamp = input("Timestamp (ISO format, or press Enter to use current time): ").strip()
-    if timestamp:
-        tile["timestamp"] = timestamp
-    else:
-        tile["timestamp"] = datetime.utcnow().isoformat() + "Z"
-    
-    thumb_url = input("Thumbnail URL (optional, press Enter to skip): ").strip()
-    if thumb_url:
-        tile["thumb_url"] = thumb_url
+    if args.thumb_url:
+        tile["thumb_url"] = args.thumb_url
     
     return index_tile(tile, INDEX_TOKEN)
 
 
 # -------------------- MAIN --------------------
 
-def main():
-    """Run all tests."""
-    print("\n" + "="*60)
-    print("MELISSA BACKEND - INDEX ENDPOINT TESTS")
-    print("="*60)
-    print(f"Target URL: {BASE_URL}")
-    print(f"Index Token: {INDEX_TOKEN[:10]}..." if len(INDEX_TOKEN) > 10 else f"Index Token: {INDEX_TOKEN}")
-    
-    # First check if service is running
-    if not test_health_check():
-        print("\n⚠ Skipping index tests - service not available")
-        return
+def parse_args():
+    """Parse command-line options; defaults reproduce a non-indexing run."""
+    parser = argparse.ArgumentParser(description="Test the backend's index endpoints")
+    parser.add_argument("--base-url", default=BASE_URL, help="backend URL")
+    parser.add_argument("--token", default=INDEX_TOKEN, help="INDEX_TOKEN of the backend")
+    parser.add_argument("--mode", choices=["skip", "sample", "custom"], default="skip",
+                        help="index the sample tiles, one custom tile, or nothing")
+    parser.add_argument("--roi", nargs=4, type=float, metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+                        help="with --mode sample, only index sample tiles inside this box")
     
-    # Run tests
-    test_invalid_auth()
-    test_missing_fields()
-    test_with_bearer_token()
+    custom = parser.add_argument_group("custom tile (--mode custom)")
+    custom.add_argument("--image-id")
+    custom.add_argument("--tile-url")
+    custom.add_argument("--west", type=float)
+    custom.add_argument("--south", type=float)
+    custom.add_argument("--east", type=float)
+    custom.add_argument("--north", type=float)
+    custom.add_argument("--timestamp", help="ISO timestamp (default: now)")
+    custom.add_argument("--thumb-url")
     
-    print("\n" + "="*60)
-    print("READY TO INDEX TILES")
-    print("="*60)
-    print("\nNote: The sample tiles use placeholder URLs.")
-    print("Replace SAMPLE_TILES with real NOAA tile URLs before indexing.")
+    args = parser.parse_args()
+    if args.mode == "custom":
+        missing = [
+            f"--{name.replace('_', '-')}"
+            for name in ("image_id", "tile_url", "west", "south", "east", "north")
+            if getattr(args, name) is None
+        ]
+        if missing:
+            parser.error(f"--mode custom requires {', '.join(missing)}")
+    return args
+
+
+def main(args=None):
+    """Run all tests."""
+    global BASE_URL, INDEX_TOKEN, INDEX_HEADERS, BEARER_HEADERS
     
-    choice = input("\nDo you want to:\n1. Index sample tiles\n2. Index a custom tile\n3. Skip indexing\nChoice (1/2/3): ").strip()
+    if args is None:
+        args = parse_args()
+    BASE_URL = args.base_url.rstrip("/")
+    if args.token != INDEX_TOKEN:
+        INDEX_TOKEN = args.token
+        INDEX_HEADERS = {"X-Index-Token": INDEX_TOKEN}
+        BEARER_HEADERS = {"Authorization": f"Bearer {INDEX_TOKEN}"}
     
-    if choice == "1":
-        test_index_multiple_tiles()
-    elif choice == "2":
-        index_custom_tile()
-    else:
-        print("\nSkipping tile indexing.")
+    # Wake the backend while the banner prints, so the health check
+    # finds it warm instead of waiting out a cold start
+    start_warmup(BASE_URL)
     
-    print("\n" + "="*60)
-    print("ALL TESTS COMPLETED")
-    print("="*60)
-    print("\nNext steps:")
-    print("1. Update SAMPLE_TILES with real NOAA tile URLs")
-    print("2. Run this script to index your tiles")
-    print("3. Use test_search.py to search the indexed tiles")
+    try:
+        print("\n" + "="*60)
+        print("MELISSA BACKEND - INDEX ENDPOINT TESTS")
+        print("="*60)
+        print(f"Target URL: {BASE_URL}")
+        print(f"Index Token: {INDEX_TOKEN[:10]}..." if len(INDEX_TOKEN) > 10 else f"Index Token: {INDEX_TOKEN}")
+        
+        # First check if service is running
+        if not health_check(BASE_URL):
+            print("\n⚠ Skipping index tests - service not available")
+            return
+        
+        # Run tests; they are independent, so run them concurrently
+        run_concurrently([
+            test_invalid_auth,
+            test_missing_fields,
+            test_with_bearer_token,
+        ])
+        
+        print("\n" + "="*60)
+        print("READY TO INDEX TILES")
+        print("="*60)
+        print("\nNote: The sample tiles use placeholder URLs.")
+        print("Replace SAMPLE_TILE_URLS and SAMPLE_BOUNDS with real NOAA tiles before indexing.")
+        
+        if args.mode == "sample":
+            tiles = sample_tiles_in_roi(*args.roi) if args.roi else SAMPLE_TILES
+            test_index_multiple_tiles(tiles)
+        elif args.mode == "custom":
+            index_custom_tile(args)
+        else:
+            print("\nSkipping tile indexing (pass --mode sample or --mode custom to index).")
+        
+        print("\n" + "="*60)
+        print("ALL TESTS COMPLETED")
+        print("="*60)
+        print("\nNext steps:")
+        print("1. Update SAMPLE_TILE_URLS and SAMPLE_BOUNDS with real NOAA tiles")
+        print("2. Run this script to index your tiles")
+        print("3. Use test_search.py to search the indexed tiles")
+    finally:
+        SESSION.close()
 
 
 if __name__ == "__main__":
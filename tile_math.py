@@ -0,0 +1,215 @@
+"""
+Slippy-map (Web Mercator) tile math shared by the NOAA tile scripts.
+
+The vectorized helpers accept NumPy arrays so a whole grid of tiles can be
+converted in one call; the scalar wrappers keep the original one-tile API.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+
+BOUNDS_DTYPE = np.dtype([
+    ("west", "f8"),
+    ("south", "f8"),
+    ("east", "f8"),
+    ("north", "f8"),
+])
+
+# Fraction of a tile within which a bounding-box edge counts as on a boundary
+TILE_EDGE_EPS = 1e-9
+
+
+def latlon_to_tiles(lat, lon, zoom, fast_mercator=False):
+    """
+    Convert arrays of lat/lon to arrays of tile x/y at the given zoom.
+
+    fast_mercator uses the log form of the Mercator projection, which needs
+    one transcendental call (sin) instead of two (tan, asinh).
+    """
+    lat_rad = np.radians(lat)
+    n = float(1 << zoom)
+    x = ((np.asarray(lon) + 180.0) / 360.0 * n).astype(np.int64)
+    if fast_mercator:
+        s = np.sin(lat_rad)
+        y = ((0.5 - np.log1p(2 * s / (1 - s)) / (4 * np.pi)) * n).astype(np.int64)
+    else:
+        y = ((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n).astype(np.int64)
+    return x, y
+
+
+def tiles_to_bounds(x, y, zoom, out=None):
+    """
+    Convert arrays of tile x/y at the given zoom to lat/lon bounds.
+
+    Returns a structured array with west/south/east/north fields. The math
+    runs in place in a single scratch buffer rather than allocating a new
+    temporary per ufunc; pass a preallocated BOUNDS_DTYPE array as out to
+    reuse the result buffer across calls.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    inv_n = 1.0 / (1 << zoom)
+    lon_scale = 360.0 * inv_n
+    lat_scale = 2.0 * math.pi * inv_n
+
+    shape = np.broadcast(x, y).shape
+    if out is None:
+        out = np.empty(shape, dtype=BOUNDS_DTYPE)
+    # Fields of a structured array are strided, so do the math in one
+    # contiguous scratch buffer and copy each finished column across.
+    scratch = np.empty(shape, dtype=np.float64)
+
+    np.multiply(x, lon_scale, out=scratch)
+    scratch -= 180.0
+    out["west"] = scratch
+    scratch += lon_scale
+    out["east"] = scratch
+
+    for field, offset in (("north", math.pi), ("south", math.pi - lat_scale)):
+        np.multiply(y, -lat_scale, out=scratch)
+        scratch += offset
+        np.sinh(scratch, out=scratch)
+        np.arctan(scratch, out=scratch)
+        np.degrees(scratch, out=scratch)
+        out[field] = scratch
+    return out
+
+
+def child_tiles(x, y, bounds, zoom):
+    """
+    Split tiles at zoom into their four children at zoom + 1.
+
+    Slippy-map tiles nest exactly across zooms, so a child's edges are its
+    parent's edges plus one midpoint in each direction. The longitude
+    midpoint is a plain average; the latitude midpoint is taken in Mercator
+    space (row 2*y + 1 at zoom + 1), which costs one sinh/arctan per parent
+    instead of recomputing both edges for all four children.
+
+    Returns (child_x, child_y, child_bounds), ordered column by column
+    within each parent.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    mid_lon = (bounds["west"] + bounds["east"]) / 2.0
+    mid_lat = np.degrees(np.arctan(np.sinh(
+        math.pi - (2 * y + 1) * (2.0 * math.pi / (1 << (zoom + 1)))
+    )))
+
+    child_x = np.stack([2 * x, 2 * x, 2 * x + 1, 2 * x + 1], axis=-1).ravel()
+    child_y = np.stack([2 * y, 2 * y + 1, 2 * y, 2 * y + 1], axis=-1).ravel()
+
+    child_bounds = np.empty(child_x.shape, dtype=BOUNDS_DTYPE)
+    child_bounds["west"] = np.stack(
+        [bounds["west"], bounds["west"], mid_lon, mid_lon], axis=-1).ravel()
+    child_bounds["east"] = np.stack(
+        [mid_lon, mid_lon, bounds["east"], bounds["east"]], axis=-1).ravel()
+    child_bounds["north"] = np.stack(
+        [bounds["north"], mid_lat, bounds["north"], mid_lat], axis=-1).ravel()
+    child_bounds["south"] = np.stack(
+        [mid_lat, bounds["south"], mid_lat, bounds["south"]], axis=-1).ravel()
+    return child_x, child_y, child_bounds
+
+
+def child_tiles_in_bbox(x, y, bounds, zoom, west, south, east, north):
+    """
+    Refine the tiles covering a bounding box at zoom to those covering it at
+    zoom + 1, via child_tiles instead of recomputing every bound.
+
+    Children are kept by the same index range tiles_in_bbox uses at zoom + 1,
+    so edges, clamping and zero-width boxes behave identically. If the
+    parents do not cover that whole range, the tiles are enumerated directly.
+    Returns (x, y, bounds) row by row from the north-west corner.
+    """
+    x0, y0, x1, y1 = _bbox_tile_range(west, south, east, north, zoom + 1)
+    cx, cy, cb = child_tiles(x, y, bounds, zoom)
+    keep = (cx >= x0) & (cx <= x1) & (cy >= y0) & (cy <= y1)
+    if np.count_nonzero(keep) != (x1 - x0 + 1) * (y1 - y0 + 1):
+        xs, ys = tiles_in_bbox(west, south, east, north, zoom + 1)
+        return xs, ys, tiles_to_bounds(xs, ys, zoom + 1)
+    cx, cy, cb = cx[keep], cy[keep], cb[keep]
+    order = np.lexsort((cx, cy))
+    return cx[order], cy[order], cb[order]
+
+
+def tile_neighborhood(x, y, radius=1):
+    """
+    Return flat arrays of tile x/y for the (2*radius+1)^2 square of tiles
+    centered on (x, y), ordered column by column.
+    """
+    offsets = np.arange(-radius, radius + 1)
+    dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+    return x + dx.ravel(), y + dy.ravel()
+
+
+def _bbox_tile_range(west, south, east, north, zoom):
+    """Inclusive (x0, y0, x1, y1) tile range covering the box, see tiles_in_bbox."""
+    n = 1 << zoom
+    fx0 = (west + 180.0) / 360.0 * n
+    fx1 = (east + 180.0) / 360.0 * n
+    fy0 = (1.0 - math.asinh(math.tan(math.radians(north))) / math.pi) / 2.0 * n
+    fy1 = (1.0 - math.asinh(math.tan(math.radians(south))) / math.pi) / 2.0 * n
+    x0 = min(max(math.floor(fx0 + TILE_EDGE_EPS), 0), n - 1)
+    y0 = min(max(math.floor(fy0 + TILE_EDGE_EPS), 0), n - 1)
+    x1 = min(max(math.ceil(fx1 - TILE_EDGE_EPS) - 1, x0), n - 1)
+    y1 = min(max(math.ceil(fy1 - TILE_EDGE_EPS) - 1, y0), n - 1)
+    return x0, y0, x1, y1
+
+
+def tiles_in_bbox(west, south, east, north, zoom):
+    """
+    Return flat int32 arrays of tile x/y for every tile covering the bounding
+    box at the given zoom, row by row from the north-west corner.
+
+    The east and south edges are exclusive, so a box ending on a tile
+    boundary does not pick up the tiles beyond it, and indices are clamped
+    to the 0..2^zoom-1 range of the world. Edges within TILE_EDGE_EPS of a
+    boundary count as on it, so rounding does not add zero-width tiles.
+    """
+    x0, y0, x1, y1 = _bbox_tile_range(west, south, east, north, zoom)
+    xs, ys = np.meshgrid(
+        np.arange(x0, x1 + 1, dtype=np.int32),
+        np.arange(y0, y1 + 1, dtype=np.int32),
+        indexing="xy"
+    )
+    return xs.ravel(), ys.ravel()
+
+
+def latlon_to_tile(lat, lon, zoom, fast_mercator=False):
+    """Convert lat/lon to tile coordinates."""
+    lat_rad = math.radians(lat)
+    n = float(1 << zoom)
+    x = int((lon + 180.0) / 360.0 * n)
+    if fast_mercator:
+        s = math.sin(lat_rad)
+        y = int((0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * n)
+    else:
+        y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return x, y
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _tile_to_bounds_cached(zoom, x, y):
+    """Bounds of one tile as a (west, south, east, north) tuple, memoized."""
+    inv_n = 1.0 / (1 << zoom)
+    lon_scale = 360.0 * inv_n
+    lat_scale = 2.0 * math.pi * inv_n
+    return (
+        x * lon_scale - 180.0,
+        math.degrees(math.atan(math.sinh(math.pi - (y + 1) * lat_scale))),
+        (x + 1) * lon_scale - 180.0,
+        math.degrees(math.atan(math.sinh(math.pi - y * lat_scale))),
+    )
+
+
+def tile_to_bounds(x, y, zoom):
+    """Convert tile coordinates back to lat/lon bounds."""
+    west, south, east, north = _tile_to_bounds_cached(int(zoom), int(x), int(y))
+    return {
+        "west": west,
+        "south": south,
+        "east": east,
+        "north": north
+    }